@@ -6,10 +6,7 @@ See:
     https://packaging.python.org/en/latest/distributing.html
 '''
 
-import os
-import re
 from setuptools import setup, find_namespace_packages
-from os import listdir
 from os.path import join, dirname
 
 
@@ -19,25 +16,11 @@ def read(*paths):
         return fp.read()
 
 
-def discover_creators():
-    creators = filter(lambda creator: creator not in [
-        '__init__.py',
-        'creator.py',
-        'README.md',
-        'libs',
-        'tests'
-    ], listdir('src/pyats/contrib/creators'))
-    creators = [creator.replace('.py', '') for creator in creators]
-    return ['{source} = pyats.contrib.creators.{source}:{source_title}'
-        .format(source=source, source_title=source.title()) \
-            for source in creators]
-
 def find_version(*paths):
     '''reads a file and returns the defined __version__ value'''
-    version_match = re.search(r"^__version__ ?= ?['\"]([^'\"]*)['\"]",
-                              read(*paths), re.M)
-    if version_match:
-        return version_match.group(1)
+    for line in read(*paths).splitlines():
+        if line.startswith('__version__'):
+            return line.split('=', 1)[1].strip().strip('\'"')
     raise RuntimeError("Unable to find version string.")
 
 
@@ -99,19 +82,14 @@ setup(
     # project keywords
     keywords = 'genie pyats test automation open source contrib',
 
-    entry_points={
-        'pyats.topology.loader': discover_creators(),
-        'pyats.easypy.plugins': [
-            'webex = pyats.contrib.plugins.webex_plugin.webex:webex_plugin',
-            'topoup = pyats.contrib.plugins.topoup_plugin.topoup:topology_up_plugin'
-        ],
-    },
+    # entry points are declared statically in setup.cfg
 
     # package dependencies
     install_requires=[
         "requests",
         "requests-toolbelt",
-        "xlrd==1.2", # xlrd==1.2 because support for '.xlsx' files was dropped in later versions
+        "xlrd", # only used for legacy '.xls' files, '.xlsx' is read with openpyxl
+        "openpyxl",
         "xlwt",
         "xlsxwriter"
     ],
@@ -1,12 +1,39 @@
-try:
-    from ansible.parsing.dataloader import DataLoader
-    from ansible.inventory.manager import InventoryManager
-    from ansible.cli.inventory import InventoryCLI
-    from ansible import context
-except Exception:
-    raise ImportError("'ansible' package is not installed. Please install by running: pip install ansible")
+import os
+import yaml
+
+from collections import OrderedDict
 from .creator import TestbedCreator
 
+# group variables which can hold the password, in order of preference
+_PASSWORD_KEYS = ('ansible_ssh_pass', 'ansible_password')
+
+# variable directories Ansible loads next to the inventory and the basedir
+_VARS_DIRS = ('group_vars', 'host_vars')
+
+
+def _tree_stamp(top):
+    """ Collects the (mtime, size) of a directory and everything below it.
+
+    Args:
+        top ('str'): Path of the directory.
+
+    Returns:
+        tuple: The stamp of every entry, empty if the directory doesn't exist.
+
+    """
+    stamp = []
+    for root, dirs, files in os.walk(top):
+        dirs.sort()
+        for name in [''] + sorted(files):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            stamp.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
 class Ansible(TestbedCreator):
     """ Ansible class (TestbedCreator)
 
@@ -33,7 +60,13 @@ class Ansible(TestbedCreator):
         creator.to_testbed_object()
 
     """
-    
+
+    # exported inventories, keyed by inventory file path and stored along with
+    # the (mtime, size) of the file and of its group_vars/host_vars at the time
+    # of the export. Only the most recently used inventories are kept
+    _INVENTORY_CACHE_SIZE = 8
+    _inventory_cache = OrderedDict()
+
     def _init_arguments(self):
         """ Specifies the arguments for the creator.
 
@@ -48,13 +81,68 @@ class Ansible(TestbedCreator):
             }
         }
 
-    def _generate(self):
-        """ Transforms Ansible data into testbed format.
-        
+    def _inventory_stamp(self, path):
+        """ Computes what an exported inventory file depends on.
+
+        Args:
+            path ('str'): Absolute path of the inventory file.
+
         Returns:
-            dict: The intermediate dictionary format of the testbed data.
-    
+            tuple: The (mtime, size) of the file and of the variable
+                directories, or None if the inventory must not be cached.
+
+        """
+        # executable inventories are dynamic scripts, their output can change
+        # at any time
+        if os.access(path, os.X_OK):
+            return None
+
+        # so are inventory plugin configs, only static host inventories are
+        # cached. INI inventories are not valid YAML and are always static
+        try:
+            with open(path) as f:
+                data = yaml.safe_load(f)
+        except (yaml.YAMLError, UnicodeDecodeError):
+            data = None
+        if isinstance(data, dict) and 'plugin' in data:
+            return None
+
+        stat = os.stat(path)
+        stamp = [(stat.st_mtime_ns, stat.st_size)]
+        for base in (os.path.dirname(path), os.path.abspath('.')):
+            for name in _VARS_DIRS:
+                stamp.append(_tree_stamp(os.path.join(base, name)))
+        return tuple(stamp)
+
+    def _load_inventory(self):
+        """ Exports the inventory through Ansible. Static inventory files are
+            only exported once until they or their variables are modified.
+
+        Returns:
+            dict: The exported inventory, which must not be modified, or None
+                if the inventory has no hosts.
+
         """
+        path = stamp = None
+        if os.path.isfile(self._inventory_name):
+            path = os.path.abspath(self._inventory_name)
+            stamp = self._inventory_stamp(path)
+        if stamp:
+            cached = self._inventory_cache.get(path)
+            if cached and cached[0] == stamp:
+                self._inventory_cache.move_to_end(path)
+                return cached[1]
+
+        # ansible is only imported once an inventory actually has to be
+        # exported, so loading this creator stays cheap
+        try:
+            from ansible.parsing.dataloader import DataLoader
+            from ansible.inventory.manager import InventoryManager
+            from ansible.cli.inventory import InventoryCLI
+            from ansible import context
+        except Exception:
+            raise ImportError("'ansible' package is not installed. Please install by running: pip install ansible")
+
         # Set Ansible arguments for export
         context.CLIARGS = {}
         context.CLIARGS['export'] = True
@@ -63,86 +151,107 @@ class Ansible(TestbedCreator):
         # Instantiate Ansible control objects
         inventory = InventoryManager(loader=DataLoader(), 
                                                 sources=self._inventory_name)
-        test = InventoryCLI(args=[''])
-        group = inventory.groups.get('all')
-        test.inventory = inventory
 
-        # Fetch all the data associated with particular inventory
-        result = test.json_inventory(top=group)
+        # An inventory without hosts cannot produce any device, skip the export
+        if not inventory.hosts:
+            result = None
+        else:
+            test = InventoryCLI(args=[''])
+            group = inventory.groups.get('all')
+            test.inventory = inventory
+
+            # Fetch all the data associated with particular inventory
+            result = test.json_inventory(top=group)
+
+        if stamp:
+            self._inventory_cache[path] = (stamp, result)
+            self._inventory_cache.move_to_end(path)
+            while len(self._inventory_cache) > self._INVENTORY_CACHE_SIZE:
+                self._inventory_cache.popitem(last=False)
+
+        return result
+
+    def _generate(self):
+        """ Transforms Ansible data into testbed format.
+        
+        Returns:
+            dict: The intermediate dictionary format of the testbed data.
+    
+        """
+        result = self._load_inventory()
+        if result is None:
+            return None
+
         testbed = {}
         devices = testbed.setdefault('devices', {})
         host_vars = result['_meta']['hostvars']
 
-        # Remove items that are not device type in result
-        del result['all']
-        del result['_meta']
-
         for device_type, category in result.items():
+            # Skip items that are not device type in result
+            if device_type in ('all', '_meta'):
+                continue
+
             # If category does not contain vars or hosts, we skip
             if not 'vars' in category or not 'hosts' in category:
                 continue
 
+            group_vars = category['vars']
+
+            # Select the correct field name based on what is given
+            password = next((group_vars[key] for key in _PASSWORD_KEYS
+                                                if key in group_vars), None)
+
+            # If password does not exist, skip over the devices of the group
+            if password is None:
+                continue
+
+            network_os = group_vars.get('ansible_network_os')
+
+            # If netconf is defined as connection type, use that instead
+            # of default CLI type
+            cli_name = 'cli'
+            if 'netconf' in group_vars.get('ansible_connection', ''):
+                cli_name = 'netconf'
+
+            port = group_vars.get('ansible_ssh_port')
+            become_method = group_vars.get('ansible_become_method')
+            become_pass = group_vars.get('ansible_become_pass')
+
             for host in category['hosts']:
-                cli_name = 'cli'
+                # A host listed in several groups keeps the first group's data
+                if host in devices:
+                    continue
 
-                # If netconf is defined as connection type, use that instead
-                # of default CLI type
-                if 'ansible_connection' in category['vars']:
-                    if 'netconf' in category['vars']['ansible_connection']:
-                        cli_name = 'netconf'
+                if network_os is None:
+                    raise Exception("Missing key word 'ansible_network_os' for %s" % host)
 
                 # Construct connection fields and credentials
-                device = devices.setdefault(host, {})
-                connections = device.setdefault('connections', {
-                     cli_name: {'protocol': 'ssh'}
-                })
-                cli = connections[cli_name]
-                default = device.setdefault('credentials', {'default': {}})
-                default = default['default']
-
-                # set connection ip
-                if host in host_vars and 'ansible_host' in host_vars[host]:
-                    cli.setdefault('ip', host_vars[host]['ansible_host'])
-                else:
-                    cli.setdefault('ip', host)
-
-                # set connection port
-                if 'ansible_ssh_port' in category['vars']:
-                    cli.setdefault('port', category['vars']['ansible_ssh_port'])
-
-                password = None
-                # Select the correct field name based on what is given
-                if 'ansible_ssh_pass' in category['vars']:
-                    password = 'ansible_ssh_pass'
-                elif 'ansible_password' in category['vars']:
-                    password = 'ansible_password'
-                else:
-                    # If password does not exist, skip over device
-                    del devices[host]
-                    continue
-                
-                # Set password and username
-                default.setdefault('password', category['vars'][password])
-                default.setdefault('username', category['vars']['ansible_user'])
+                cli = {
+                    'protocol': 'ssh',
+                    'ip': host_vars.get(host, {}).get('ansible_host', host)
+                }
+                if port is not None:
+                    cli['port'] = port
+                connections = {cli_name: cli}
 
                 # If device has any other connection types, we also
                 # set those respectively with their password
-                if 'ansible_become_method' in category['vars'] and \
-                    'ansible_become_pass' in category['vars']:
-                    inner = connections.setdefault(
-                        category['vars']['ansible_become_method'], {})
-                    inner.setdefault('password',
-                        category['vars']['ansible_become_pass'])
-
-                # Set other device properties
-                device.setdefault('alias', host)
-
-                if 'ansible_network_os' not in category['vars']:
-                    raise Exception("Missing key word 'ansible_network_os' for %s" % host)
+                if become_method is not None and become_pass is not None:
+                    connections.setdefault(become_method, {})['password'] = \
+                                                                    become_pass
 
-                device.setdefault('os', category['vars']['ansible_network_os'])
-                device.setdefault('platform',
-                                        category['vars']['ansible_network_os'])
-                device.setdefault('type', device_type)
+                devices[host] = {
+                    'connections': connections,
+                    'credentials': {
+                        'default': {
+                            'password': password,
+                            'username': group_vars['ansible_user']
+                        }
+                    },
+                    'alias': host,
+                    'os': network_os,
+                    'platform': network_os,
+                    'type': device_type
+                }
 
         return testbed if len(testbed['devices']) > 0 else None
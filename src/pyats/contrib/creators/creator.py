@@ -1,16 +1,60 @@
 import os
 import yaml
-import re
 import logging
 import sys
-import argparse
+import functools
 
-from pyats.utils.secret_strings import SecretString
 from pyats.topology.loader.base import BaseTestbedLoader
 
+# use the libyaml emitter when PyYAML was built with it
+try:
+    from yaml import CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+
 logger = logging.getLogger(__name__)
 
 
+def _iter_password_leaves(data):
+    """ Walks the nested dictionaries and yields every password which is not
+        asked on connect.
+
+    Args:
+        data ('dict'): The nested dictionary to walk.
+
+    Yields:
+        tuple: The parent dictionary, the key and the plain text password.
+
+    """
+    for key, value in data.items():
+        if isinstance(value, dict):
+            yield from _iter_password_leaves(value)
+        elif key == "password" and value != '%ASK{}':
+            yield data, key, value
+
+
+@functools.lru_cache(maxsize=1024)
+def _encode_secret_cached(plain_text):
+    """ Encodes the plain text password, remembering the result so passwords
+        shared by many devices are only encoded once.
+
+        The cache lives in process memory only and holds the plain text as its
+        key. Call '_encode_secret_cached.cache_clear()' to drop it, e.g. after
+        changing the pyATS secret key.
+
+    Args:
+        plain_text ('str'): the plain text password.
+
+    Returns:
+        str: The encoded password.
+
+    """
+    from pyats.utils.secret_strings import SecretString
+
+    encoded = SecretString.from_plaintext(plain_text)
+    return '%ENC{' + encoded.data + '}'
+
+
 class TestbedCreator(BaseTestbedLoader):
     """ TestbedCreator class (BaseTestbedLoader)
 
@@ -44,6 +88,11 @@ class TestbedCreator(BaseTestbedLoader):
     
     """
 
+    # device columns which are turned into connections and credentials
+    _CONSUMED_KEYS = frozenset(('hostname', 'os', 'protocol', 'proxy',
+                                'password', 'enable_password', 'username'))
+    _CONSUMED_KEYS_WITH_IP = _CONSUMED_KEYS | {'ip'}
+
     def __init__(self, **kwargs):
         """ Instantiates the testbed creator with appropriate arguments.
         
@@ -52,6 +101,7 @@ class TestbedCreator(BaseTestbedLoader):
         self._keys = ['hostname','ip','username', 'password', 'protocol', 'os']
         self._cli_list_arguments = []
         self._cli_replacements = {}
+        self._ensured_dirs = set()
 
         arguments = self._init_arguments()
         kwargs.update(self._parse_cli())
@@ -80,64 +130,52 @@ class TestbedCreator(BaseTestbedLoader):
             dict: The parsed arguments in dictionary format.
 
         """
-        parser = argparse.ArgumentParser()
-        parser.add_argument('args', nargs=argparse.REMAINDER)
-        args = parser.parse_args(sys.argv)
+        argv = sys.argv[1:]
+        replacements = self._cli_replacements
+        list_arguments = self._cli_list_arguments
         kwargs = {}
+        i = 0
 
-        if args.args and len(args.args) > 0:
-            args.args = args.args[1:]
-            i = 0
+        while i < len(argv):
+            arg = argv[i]
+            i += 1
 
-            while i < len(args.args):
-                arg = args.args[i]
-                i += 1
+            # If argument name is in replacement dictionary, 
+            # replace it with correspoding name and value
+            if arg in replacements:
+                name, value = replacements[arg]
+                kwargs.setdefault(name, value)
+                continue
 
-                # If argument name is in replacement dictionary, 
-                # replace it with correspoding name and value
-                if arg in self._cli_replacements:
-                    name, value = self._cli_replacements[arg]
-                    kwargs.setdefault(name, value)
-                    continue
+            # If argument expects a list, search and return list
+            if arg in list_arguments:
+                j = i
 
-                # If argument expects a list, search and return list
-                if arg in self._cli_list_arguments:
-                    j = i
-                    
-                    # Collect parameters
-                    while j < len(args.args) and not args.args[j].startswith('--') and \
-                        not '-r' in args.args[j]: j += 1
+                # Collect parameters
+                while j < len(argv) and not argv[j].startswith(('--', '-r')):
+                    j += 1
 
-                    kwargs.setdefault(arg.replace('--', '').replace('-', '_'), 
-                                                                args.args[i:j])
+                kwargs.setdefault(arg.replace('--', '').replace('-', '_'),
+                                                                argv[i:j])
 
-                    # Incrememt index
-                    i = j
-                    continue
+                # Incrememt index
+                i = j
+                continue
 
-                parts = arg.split('=', 1)
-                key = None
-                value = None
-
-                if len(parts) < 2:
-                    value = None
-
-                    if i < len(args.args) and not args.args[i].startswith('-'):
-                        # Handle spaces
-                        value = args.args[i]
-                        i += 1
-                    else: 
-                        # Assume flag value if no assignment is provided
-                        value = True
-                    
-                    key = parts[0]
-                else:
-                    key, value = parts
-                
-                # Convert key to variable name
-                key = key.replace('--', '')
-                key = key.replace('-', '_')
-                kwargs.setdefault(key, value)
+            key, assigned, value = arg.partition('=')
+
+            if not assigned:
+                if i < len(argv) and not argv[i].startswith('-'):
+                    # Handle spaces
+                    value = argv[i]
+                    i += 1
+                else: 
+                    # Assume flag value if no assignment is provided
+                    value = True
+
+            # Convert key to variable name
+            key = key.replace('--', '').replace('-', '_')
+            kwargs.setdefault(key, value)
 
         return kwargs
 
@@ -207,10 +245,7 @@ class TestbedCreator(BaseTestbedLoader):
             raise Exception('Output "{o}" is a directory'
                                                     .format(o=output_location))
         testbed = self._generate()
-        encode_password = False
-        
-        if hasattr(self, '_encode_password'):
-            encode_password = self._encode_password
+        encode_password = getattr(self, '_encode_password', False)
 
         try:
             self._write_yaml(output_location, testbed, encode_password)
@@ -270,15 +305,9 @@ class TestbedCreator(BaseTestbedLoader):
 
         """
         # ask password on connect if not provided, otherwise encode the password
-        stack = [devices]
-        while len(stack) > 0:
-            current = stack.pop()
-            for key, value in current.items():
-                if key == "password" and value != '%ASK{}':
-                    value = self._encode_secret(value)
-                    current[key] = value
-                elif isinstance(value, dict):
-                    stack.append(value)
+        encode = self._encode_secret
+        for parent, key, value in _iter_password_leaves(devices):
+            parent[key] = encode(value)
 
     def _encode_secret(self, plain_text):
         """ Performs password encoding.
@@ -290,8 +319,7 @@ class TestbedCreator(BaseTestbedLoader):
             str: The encoded password.
 
         """
-        encoded = SecretString.from_plaintext(plain_text)
-        return '%ENC{' + encoded.data + '}'
+        return _encode_secret_cached(plain_text)
 
     def _write_yaml(self, output, devices, encode_password, input_file=None):
         """ Write device data to yaml file.
@@ -306,37 +334,44 @@ class TestbedCreator(BaseTestbedLoader):
         # if empty dict, do nothing
         if not devices:
             return
-        # Make sure output file can be created
-        try:
-            os.makedirs(os.path.dirname(output), exist_ok=True)
-        except FileNotFoundError:
-            # If a file which does not contains a directory name
-            pass
+        # Make sure output file can be created, once per output directory
+        directory = os.path.dirname(output)
+        if directory and directory not in self._ensured_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._ensured_dirs.add(directory)
 
         if encode_password:
             self._encode_all_password(devices)
 
-        with open(output, 'w') as f:
-            try:
-                yaml.dump(devices, f, default_flow_style=False)
-            except Exception as e:
-                self._result['errored'][
-                    input_file.lstrip('./')
-                ] = 'has an error: {e}'.format(e=str(e))
-                return
+        # results are reported against the input file, if any
+        name = input_file.lstrip('./') if input_file else output
+
+        # serialize in memory first so the file is written in one go, the
+        # emitter encodes to UTF-8 bytes directly
+        try:
+            data = yaml.dump(devices, Dumper=YamlDumper, encoding='utf-8',
+                                                default_flow_style=False)
+        except Exception as e:
+            self._result['errored'][name] = 'has an error: {e}'.format(e=str(e))
+            return
+
+        with open(output, 'wb', buffering=1 << 20) as f:
+            f.write(data)
         if input_file:
-            name = input_file.lstrip('./')
             self._result['success'].setdefault(name, "")
             self._result['success'][name] += '-> {f}\n'.format(f=output)
         else:
             self._result['success'][output] = ''
 
-    def _construct_yaml(self, devices):
+    def _construct_yaml(self, devices, keys=None):
         """ Construct list of dicts containing device data into nested yaml 
             structure.
 
         Args:
-            devices ('list'): List of dict containing device attributes.
+            devices ('list'): List of dict containing device attributes, which
+                are left unmodified.
+            keys ('list'): The keys the device data was read with, defaults to
+                the keys of the creator.
 
         Returns:
              dict: Testbed dictionary that's ready to be dumped into yaml.
@@ -345,52 +380,54 @@ class TestbedCreator(BaseTestbedLoader):
         yaml_dict = {
             'devices': {}
         }
-        seen_hostnames = set()
+        yaml_devices = yaml_dict['devices']
+
+        # without an enable_password column, enable falls back to the default
+        # password of the device
+        ask_enable = 'enable_password' in (self._keys if keys is None
+                                                                    else keys)
+
         for row in devices:
             try:
-                name = row.pop('hostname')
+                name = row['hostname']
             except KeyError:
                 raise KeyError('Empty line found in given CSV/Excel file.')
 
-            if name in seen_hostnames:
+            if name in yaml_devices:
                 raise Exception('Duplicate hostname "{n}" detected'
                                                                 .format(n=name))
-            else:
-                seen_hostnames.add(name)
 
             try:
                 # get port from ip
-                ad_port = row['ip'].strip().rsplit(':', 1)
-                address, port = ad_port[0], ad_port[1] if len(ad_port) > 1 else None
-                os = row.pop('os')
-
-                # build the connection dict
-                if port:
-                    connections = {
-                        'cli': {
-                            'ip': address,
-                            'port': int(port),
-                            'protocol': row.pop('protocol')
-                        }
+                ip = row['ip']
+                ad_port = ip.strip().rsplit(':', 1)
+                device_os = row['os']
+
+                # build the connection dict, the raw ip is kept as a device
+                # attribute when it carries a port
+                if len(ad_port) > 1 and ad_port[1]:
+                    consumed = self._CONSUMED_KEYS
+                    cli = {
+                        'ip': ad_port[0],
+                        'port': int(ad_port[1]),
+                        'protocol': row['protocol']
                     }
                 else:
-                    connections = {
-                        'cli': {
-                            'ip': row.pop('ip'),
-                            'protocol': row.pop('protocol')}}
-                
+                    consumed = self._CONSUMED_KEYS_WITH_IP
+                    cli = {
+                        'ip': ip,
+                        'protocol': row['protocol']}
+
                 if 'proxy' in row:
-                    connections['cli'].update({'proxy': row.pop('proxy')})
+                    cli['proxy'] = row['proxy']
 
                 # build the credentials dict
-                password = row.pop('password', '%ASK{}')
-                if 'enable_password' in self._keys:
-                    enable_password = row.pop('enable_password', '%ASK{}')
-                else:
-                    enable_password = row.pop('enable_password', password)
+                password = row.get('password', '%ASK{}')
+                enable_password = row.get('enable_password',
+                                        '%ASK{}' if ask_enable else password)
                 credentials = {
                     'default': {
-                        'username': row.pop('username'),
+                        'username': row['username'],
                         'password': password},
                     'enable': {
                         'password':  enable_password
@@ -399,19 +436,19 @@ class TestbedCreator(BaseTestbedLoader):
             except KeyError as e:
                 raise KeyError('Missing required key {k} for device {d}'
                                                     .format(k=str(e), d=name))
-            dev = yaml_dict['devices'].setdefault(name, {})
-            dev['os'] = os
-            dev['connections'] = connections
+            yaml_devices[name] = dev = {}
+            dev['os'] = device_os
+            dev['connections'] = {'cli': cli}
             dev['credentials'] = credentials
-            type = row.get('type')
-            dev['type'] = type if type else os
-            if row and len(row) > 0:
-                for key, value in row.items():
-                    if 'custom:' in key:
-                        dev.setdefault('custom', {}).setdefault(
-                            key.replace('custom:', ''), value)
-                    else:
-                        dev.setdefault(key, value)
+            dev['type'] = row.get('type') or device_os
+            for key, value in row.items():
+                if key in consumed:
+                    continue
+                if 'custom:' in key:
+                    dev.setdefault('custom', {}).setdefault(
+                        key.replace('custom:', ''), value)
+                else:
+                    dev.setdefault(key, value)
 
         return yaml_dict
 
@@ -425,26 +462,27 @@ class TestbedCreator(BaseTestbedLoader):
             logger.warning('No file found.')
             return
 
-        if self._result['success']:
+        if self._result['success'] and logger.isEnabledFor(logging.INFO):
             if 'template' in self._result['success']:
                 # print template create successfully
-                logger.info('Template file generated: {file}'.format(file=self._result['success']['template']))
+                logger.info('Template file generated: %s',
+                                            self._result['success']['template'])
             else:
                 # print testbeds create successfully
                 logger.info('Testbed file generated: ')
                 for k, v in self._result['success'].items():
-                    logger.info('{k} {v}'.format(k=k,v=v))
+                    logger.info('%s %s', k, v)
 
         # print the ones that are errored
-        if self._result['errored']:
+        if self._result['errored'] and logger.isEnabledFor(logging.ERROR):
             logger.info('')
             logger.error('Errors:')
             for k, v in self._result['errored'].items():
-                logger.error('{k} {v}'.format(k=k,v=v))
+                logger.error('%s %s', k, v)
 
         # print warnings
-        if self._result['warning']:
+        if self._result['warning'] and logger.isEnabledFor(logging.WARNING):
             logger.info('')
             logger.warning('Warnings:')
             for k, v in self._result['warning'].items():
-                logger.warning('{k} {v}'.format(k=k,v=v))
+                logger.warning('%s %s', k, v)
@@ -1,11 +1,31 @@
 import os
-import xlrd
 import csv
-import pathlib
+import sys
+import threading
 
-from pyats.topology import loader
+from operator import itemgetter
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from .creator import TestbedCreator
 
+# filters (key, value) pairs down to the ones which have a value
+_has_value = itemgetter(1)
+
+
+def _intern_keys(keys):
+    """ Interns the header keys so that every row dictionary shares the same
+        key objects.
+
+    Args:
+        keys ('iterable'): The header keys.
+
+    Returns:
+        list: The interned keys, non string keys are kept as is.
+
+    """
+    return [sys.intern(k) if isinstance(k, str) else k for k in keys]
+
+
 class File(TestbedCreator):
     """ File class (TestbedCreator)
 
@@ -38,6 +58,16 @@ class File(TestbedCreator):
 
     """
 
+    # number of files read ahead of the one being converted in folder mode
+    _READ_AHEAD = 8
+
+    # parsed input files, keyed by file path and stored along with the
+    # (mtime, size) of the file at the time it was read. Only the most
+    # recently used files are kept
+    _DEVICE_DATA_CACHE_SIZE = 32
+    _device_data_cache = OrderedDict()
+    _device_data_lock = threading.Lock()
+
     def _init_arguments(self):
         """ Specifies the arguments for the creator.
 
@@ -65,15 +95,14 @@ class File(TestbedCreator):
             bool: Indication that the operation is successful or not.
         
         """
-        testbed = self._generate()
-
-        if isinstance(testbed, list):
-            for base, item in testbed:
+        # folders are written file by file as they are read
+        if os.path.isdir(self._path):
+            for base, item in self._generate_iter():
                 self._write_yaml(os.path.join(output_location, base), 
                             item, self._encode_password, input_file=self._path)
         else:
-            self._write_yaml(output_location, testbed, self._encode_password,
-                                                        input_file=self._path)
+            self._write_yaml(output_location, self._generate(),
+                            self._encode_password, input_file=self._path)
 
         return True
 
@@ -104,52 +133,131 @@ class File(TestbedCreator):
         
         # if is a dir then walk through it
         if os.path.isdir(self._path):
-            result = []
+            return list(self._generate_iter())
+
+        self._keys, devices = self._read_device_data(self._path)
+        return self._construct_yaml(devices)
 
-            for root, _, files in os.walk(self._path):
-                for file in files:
-                    input_file = os.path.join(root, file)
-                    relative = os.path.relpath(input_file, self._path)
-                    devices = self._read_device_data(input_file)
+    def _generate_iter(self):
+        """ Lazily creates the testbed data of every file in the input folder,
+            so only a few files are held in memory at a time.
 
-                    # The testbed filename should be same as the file
-                    output = os.path.splitext(relative)[0] + '.yaml'
+        Yields:
+            tuple: The testbed filename and the intermediate testbed dictionary.
+
+        """
+        pending = deque()
 
-                    result.append((output, self._construct_yaml(devices)))
-            
+        # Reading the files is mostly I/O and decompression, so a few files
+        # are read ahead in parallel. The readers do not touch any shared state.
+        with ThreadPoolExecutor() as executor:
+            for relative, input_file in self._iter_files(self._path):
+                pending.append((relative, executor.submit(
+                                        self._read_device_data, input_file)))
+                if len(pending) > self._READ_AHEAD:
+                    yield self._construct_file(*pending.popleft())
+
+            while pending:
+                yield self._construct_file(*pending.popleft())
+
+    def _construct_file(self, relative, future):
+        """ Creates the testbed data of a file read in the background.
+
+        Args:
+            relative ('str'): Path of the file relative to the input folder.
+            future ('Future'): The pending result of '_read_device_data'.
+
+        Returns:
+            tuple: The testbed filename and the intermediate testbed dictionary.
+
+        """
+        keys, devices = future.result()
+
+        # The testbed filename should be same as the file
+        output = os.path.splitext(relative)[0] + '.yaml'
+        return output, self._construct_yaml(devices, keys=keys)
+
+    def _iter_files(self, directory, relative=''):
+        """ Walks the directory with os.scandir, yielding the files of a
+            directory before descending into its subdirectories. Symbolic
+            links to directories are not followed.
+
+        Args:
+            directory ('str'): Path of the directory to walk.
+            relative ('str'): Path of the directory relative to the input path.
+
+        Yields:
+            tuple: The file path relative to the input path and its full path.
+
+        """
+        subdirs = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    yield os.path.join(relative, entry.name), entry.path
                 # if recursive option is not set, then stop after first level
-                if not self._recurse:
-                    break
-        else:
-            devices = self._read_device_data(self._path)
-            return self._construct_yaml(devices)
-        
-        return result
+                elif self._recurse and not entry.is_symlink():
+                    subdirs.append(entry)
+
+        for entry in subdirs:
+            yield from self._iter_files(entry.path,
+                                        os.path.join(relative, entry.name))
 
     def _read_device_data(self, file):
-        """ Read device data based on file type.
+        """ Read device data based on file type. Files are only parsed once
+            until they are modified.
 
         Args:
             file ('str'): Path of the file.
         
         Returns:
-            list: List of dictionaries containing device data.
+            tuple: The header keys of the file and the list of dictionaries
+                containing device data, which must not be modified.
 
         """
-        _, extension = os.path.splitext(file)
+        path = os.path.abspath(file)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        cache = self._device_data_cache
+        with self._device_data_lock:
+            cached = cache.get(path)
+            if cached and cached[0] == stamp:
+                cache.move_to_end(path)
+                return cached[1]
+
+        # parse outside of the lock so that folder read ahead stays parallel
+        data = self._parse_device_data(file)
+
+        with self._device_data_lock:
+            cache[path] = (stamp, data)
+            cache.move_to_end(path)
+            while len(cache) > self._DEVICE_DATA_CACHE_SIZE:
+                cache.popitem(last=False)
+
+        return data
+
+    def _parse_device_data(self, file):
+        """ Parse device data based on file type.
+
+        Args:
+            file ('str'): Path of the file.
         
-        # Check if file is csv or xls
-        devices = {}
+        Returns:
+            tuple: The header keys of the file and the list of dictionaries
+                containing device data.
+
+        """
+        _, extension = os.path.splitext(file)
 
+        # Check if file is csv or xls
         if extension == '.csv':
-            devices = self._read_csv(file)
+            return self._read_csv(file)
         elif extension in {'.xls', '.xlsx'}:
-            devices = self._read_excel(file)
+            return self._read_excel(file)
         else:
             raise Exception("Given path is not a folder or a CSV/Excel file.")
 
-        return devices
-
     def _read_csv(self, file_name):
         """ Reads CSV file containing device data.
 
@@ -157,19 +265,21 @@ class File(TestbedCreator):
             file_name ('str'): Name of the CSV file.
 
         Returns:
-            list: List of dictionaries containing the device attributes from 
-                each row of the file.
+            tuple: The header keys and the list of dictionaries containing the
+                device attributes from each row of the file.
 
         """
-        row_lst = []
-        with open(file_name, 'r') as f:
+        with open(file_name, 'r', newline='', buffering=1 << 20) as f:
             reader = csv.reader(f)
-            self._keys = next(reader)
-            for row in reader:
-                # Only take key which has value
-                row_lst.append({k: v for k, v in dict(
-                                            zip(self._keys, row)).items() if v})
-        return row_lst
+            header = next(reader, None)
+            if header is None:
+                raise Exception("Given CSV file is empty: {f}".format(
+                                                                f=file_name))
+            keys = _intern_keys(header)
+
+            # Only take key which has value
+            return keys, [dict(filter(_has_value, zip(keys, row)))
+                                                            for row in reader]
 
     def _read_excel(self, file_name):
         """ Read Excel file containing device data.
@@ -178,15 +288,53 @@ class File(TestbedCreator):
             file_name ('str'): name of the excel file
 
         Returns:
-            list: List of dictionaries containing device attributes from each
-                row of the file.
+            tuple: The header keys and the list of dictionaries containing
+                device attributes from each row of the file.
 
         """
-        row_lst = []
-        ws = xlrd.open_workbook(file_name).sheet_by_index(0)
-        self._keys = ws.row_values(0)
-        for i in range(1, ws.nrows):
+        if file_name.endswith('.xlsx'):
+            return self._read_xlsx(file_name)
+
+        import xlrd
+
+        # Only the first sheet is loaded, and released once it is read
+        wb = xlrd.open_workbook(file_name, on_demand=True)
+        try:
+            rows = wb.sheet_by_index(0).get_rows()
+            keys = _intern_keys(cell.value for cell in next(rows, ()))
+
             # Only take key which has value
-            row_lst.append({k: v for k, v in dict(
-                            zip(self._keys, ws.row_values(i))).items() if v})
-        return row_lst
+            row_lst = [{k: cell.value for k, cell in zip(keys, row)
+                                                if cell.value} for row in rows]
+            wb.unload_sheet(0)
+        finally:
+            wb.release_resources()
+
+        return keys, row_lst
+
+    def _read_xlsx(self, file_name):
+        """ Read XLSX file containing device data, streaming the rows of the
+            first sheet instead of loading the whole workbook.
+
+        Args:
+            file_name ('str'): name of the excel file
+
+        Returns:
+            tuple: The header keys and the list of dictionaries containing
+                device attributes from each row of the file.
+
+        """
+        import openpyxl
+
+        wb = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+        try:
+            rows = wb.worksheets[0].iter_rows(values_only=True)
+            keys = _intern_keys(next(rows, ()))
+
+            # Only take key which has value, empty rows are kept so they are
+            # reported like in CSV and XLS files
+            row_lst = [dict(filter(_has_value, zip(keys, row))) for row in rows]
+        finally:
+            wb.close()
+
+        return keys, row_lst
@@ -1,11 +1,24 @@
 import logging
 import getpass
-import os
 
 from .creator import TestbedCreator
 
 logger = logging.getLogger(__name__)
 
+# invalid answers for questions which must not be left empty
+_NON_EMPTY = frozenset({''})
+
+# per device prompts
+_PROMPT_IP = '   IP (ip, or ip:port): '
+_PROMPT_PROTOCOL = '   Protocol (ssh, telnet, ...): '
+_PROMPT_OS = '   OS (iosxr, iosxe, ios, nxos, linux, ...): '
+
+# password prompts, a blank answer asks for the password on connect
+_PROMPT_DEFAULT_PASSWORD = ('Default Password '
+                            '(leave blank if you want to enter on demand): ')
+_PROMPT_ENABLE_PASSWORD = ('Enable Password '
+                           '(leave blank if you want to enter on demand): ')
+
 class Interactive(TestbedCreator):
     """ Interactive class (TestbedCreator)
 
@@ -84,19 +97,15 @@ class Interactive(TestbedCreator):
             str: The user's input.
 
         """
-        response = ''
-
-        # if provided a list of valid answers, then check if input is valid
-        if iterable:
-            if invalid:
-                while response in iterable:
-                    response = input(msg)
-            else:
-                while response not in iterable:
-                    response = input(msg)
-        else:
+        # without a list of valid answers, any input is accepted
+        if not iterable:
+            return input(msg)
+
+        # ask again until the input is valid
+        while True:
             response = input(msg)
-        return response
+            if (response in iterable) != invalid:
+                return response
 
     def _generate(self):
         """ Core implementation of how the testbed data is created.
@@ -114,14 +123,6 @@ class Interactive(TestbedCreator):
         enable_all_password = None
         name_set = set()
 
-        # (keyname, description)
-        keys = [('hostname', ''),
-                ('IP', '(ip, or ip:port)'),
-                ('Username', ''),
-                ('Password', ''),
-                ('Protocol', '(ssh, telnet, ...)'),
-                ('OS', '(iosxr, iosxe, ios, nxos, linux, ...)')]
-
         # check if all devices have same username
         user_answer = self._get_info(
             'Do all of the devices have the same username? [y/n] ',
@@ -130,7 +131,7 @@ class Interactive(TestbedCreator):
         # if same username, ask user
         if self._VALID_ANSWER.get(user_answer):
             all_username = self._get_info(
-                            'Common Username: ', iterable={''}, invalid=True)
+                        'Common Username: ', iterable=_NON_EMPTY, invalid=True)
             logger.info('')
 
         # check if all devices have same password
@@ -141,8 +142,7 @@ class Interactive(TestbedCreator):
         # if same password, ask user
         if self._VALID_ANSWER.get(pass_answer):
             all_password = self._prompt_password(
-                "Common Default Password "
-                + "(leave blank if you want to enter on demand): ")
+                                            'Common ' + _PROMPT_DEFAULT_PASSWORD)
             logger.info('')
 
         enable_pass_answer = self._get_info(
@@ -153,89 +153,63 @@ class Interactive(TestbedCreator):
         # set it to the same as default password
         if self._VALID_ANSWER.get(enable_pass_answer):
             enable_all_password = self._prompt_password(
-                "Common Enable Password " + 
-                "(leave blank if you want to enter on demand): ")
+                                            'Common ' + _PROMPT_ENABLE_PASSWORD)
             logger.info('')
 
+        # additional keys followed by the converted custom keys, which are
+        # asked for every device
+        add_keys = list(self._add_keys or [])
+        if self._add_custom_keys:
+            add_keys.extend("custom:{}".format(key.lower())
+                                            for key in self._add_custom_keys)
+
         while more_device:
             logger.info('')
             device = {}
-            for key, description in keys:
 
-                # Get Device hostname
-                if key == 'hostname':
-                    name = self._get_info('Device hostname: ', iterable={''}, 
+            # Get Device hostname, if device name already exist, ask again
+            while True:
+                name = self._get_info('Device hostname: ',
+                                            iterable=_NON_EMPTY, invalid=True)
+                if name not in name_set:
+                    break
+                logger.info('%s has been already entered', name)
+            device['hostname'] = name
+            name_set.add(name)
+
+            device['ip'] = self._get_info(_PROMPT_IP, iterable=_NON_EMPTY,
                                                                 invalid=True)
 
-                    # if device name already exist, ask again
-                    while name in name_set:
-                        logger.info('{d} has been already entered'
-                                                                .format(d=name))
-                        name = self._get_info('Device hostname: ', 
-                                                    iterable={''}, invalid=True)
-                    device['hostname'] = name
-                    name_set.add(name)
-                    continue
-
-                elif key.lower() == 'username':
-
-                    # ask user for username
-                    if all_username:
-                        device['username'] = all_username
-                    else:
-                        device['username'] = self._get_info(
-                                '   Username: ', iterable={''}, invalid=True)
-                    continue
-
-                elif key.lower() == 'password':
-
-                    # ask user for password if not all devices has the same
-                    if all_password:
-                        device['password'] = all_password
-                    else: 
-                        device['password'] = self._prompt_password(
-                        "Default Password " +
-                        "(leave blank if you want to enter on demand): ")
-                    # ask for enable password if not the same, 
-                    # and if user entered nothing set default password to enable
-                    if enable_all_password:
-                        enable_pass = enable_all_password 
-                    else:
-                        enable_pass = self._prompt_password(
-                        "Enable Password " +
-                        "(leave blank if you want to enter on demand): ")
-
-                    if enable_pass:
-                        device['enable_password'] = enable_pass
-                    else:
-                        device['enable_password'] = ''
-                    continue
-
-                else:
-                    # Any other key
-                    device[key.lower()] = self._get_info('   {k} {d}: '
-                    .format(k=key, d=description), iterable={''}, invalid=True)
-
-            # ask input for custom keys if supplied
-            if self._add_custom_keys:
-                if not self._add_keys:
-                    self._add_keys = []
-                self._add_keys.extend("custom:{}".format(key.lower())
-                                            for key in self._add_custom_keys)
+            # ask user for username if not all devices has the same
+            device['username'] = all_username or self._get_info(
+                            '   Username: ', iterable=_NON_EMPTY, invalid=True)
+
+            # ask user for password if not all devices has the same
+            device['password'] = all_password or self._prompt_password(
+                                                    _PROMPT_DEFAULT_PASSWORD)
+
+            # ask for enable password if not the same
+            device['enable_password'] = enable_all_password or \
+                            self._prompt_password(_PROMPT_ENABLE_PASSWORD)
+
+            device['protocol'] = self._get_info(_PROMPT_PROTOCOL,
+                                            iterable=_NON_EMPTY, invalid=True)
+            device['os'] = self._get_info(_PROMPT_OS, iterable=_NON_EMPTY,
+                                                                invalid=True)
 
-            if self._add_keys:
-                for k in self._add_keys:
-                    if k not in device:
-                        device[k.lower()] = self._get_info(
-                            '   Value for custom key "{k}": '.format(k=k),
-                            iterable={''},
-                            invalid=True)
+            # ask input for additional and custom keys if supplied
+            for k in add_keys:
+                if k not in device:
+                    device[k.lower()] = self._get_info(
+                        '   Value for custom key "{k}": '.format(k=k),
+                        iterable=_NON_EMPTY,
+                        invalid=True)
 
             devices.append(device)
 
             # ask if user want to enter more devices
             answer = self._get_info('More devices to add ? [y/n] ', 
                                             iterable=self._VALID_ANSWER).lower()
-            more_device = self._VALID_ANSWER[answer]
+            more_device = self._VALID_ANSWER.get(answer, False)
 
         return self._construct_yaml(devices)
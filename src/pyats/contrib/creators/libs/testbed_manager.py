@@ -1,7 +1,8 @@
 import logging
 import argparse
 import ipaddress
-from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from genie.conf.base import Testbed, Device, Interface, Link
 from pyats.async_ import pcall
 from pyats.log import TaskLogHandler
@@ -9,22 +10,40 @@ from pyats.log import ScreenHandler
 
 log = logging.getLogger(__name__)
 
+
+def _proxy_key(proxy):
+    '''Builds a hashable key for a proxy, equal proxies given as dictionaries
+    get the same key whatever the order of their keys
+
+    Args:
+        proxy ('str' or 'dict'): the proxy of a connection
+
+    Returns:
+        the key of the proxy
+    '''
+    if isinstance(proxy, dict):
+        return tuple(sorted((k, _proxy_key(v)) for k, v in proxy.items()))
+    if isinstance(proxy, list):
+        return tuple(_proxy_key(v) for v in proxy)
+    return proxy
+
+
 class TestbedManager(object):
     '''Class designed to handle device interactions for connecting devices
        and cdp and lldp
     '''
-    def __init__(self, testbed, supported_os, config=False, ssh_only=False, alias_dict={},
+    def __init__(self, testbed, supported_os, config=False, ssh_only=False, alias_dict=None,
                  timeout=10, logfile = '', disable_config=False):
 
         self.config = config
         self.ssh_only = ssh_only
         self.testbed = testbed
-        self.alias_dict = alias_dict
+        self.alias_dict = alias_dict if alias_dict is not None else {}
         self.timeout = int(timeout)
         self.cdp_configured = set()
         self.lldp_configured = set()
         self.visited_devices = set()
-        self.supported_os = supported_os
+        self.supported_os = frozenset(supported_os)
         self.logfile = logfile
         if disable_config:
             self.disable_config = []
@@ -55,18 +74,25 @@ class TestbedManager(object):
                 if device_obj.connected or device_name in self.visited_devices:
                     continue
                 if device_obj.os not in self.supported_os:
-                    log.debug('     Device {} does not have valid os, skipping'.format(device_name))
+                    log.debug('     Device %s does not have valid os, skipping', device_name)
                     skip.add(device_name)
                     continue
-                log.debug('     Attempting to connect to {device}'.format(device=device_name))
-                results[device_name] = executor.submit(self._connect_one_device,
-                                                       device_name)
-        
-        for name, exe in results.items():
-            if exe.result():
-                success.add(name)
-            else:
-                fail.add(name)
+                log.debug('     Attempting to connect to %s', device_name)
+                results[executor.submit(self._connect_one_device,
+                                        device_name)] = device_name
+
+            # Sort the devices as soon as each connection attempt finishes, a
+            # device whose attempt raised counts as failed
+            for exe in as_completed(results):
+                name = results[exe]
+                error = exe.exception()
+                if error is not None:
+                    log.debug('     Error while connecting to %s: %s', name, error)
+                    fail.add(name)
+                elif exe.result():
+                    success.add(name)
+                else:
+                    fail.add(name)
 
         return success, fail, skip
         
@@ -86,72 +112,116 @@ class TestbedManager(object):
         else:
             to_stdout = False
             
+        dev = self.testbed.devices[device]
+
         # if there is a preferred alias for the device, attempt to connect with device
         # using that alias, if the attempt fails or the alias doesn't exist, it will
         # attempt to connect with the default
-        if device in self.alias_dict:
-            if self.alias_dict[device] in self.testbed.devices[device].connections:
-                log.debug('     Attempting to connect to {} with alias {}'.format(device, self.alias_dict[device]))
+        alias = self.alias_dict.get(device)
+        if alias is not None:
+            if alias in dev.connections:
+                log.debug('     Attempting to connect to %s with alias %s', device, alias)
                 try:
-                    self.testbed.devices[device].connect(via = str(self.alias_dict[device]),
-                                                         connection_timeout=self.timeout,
-                                                         log_stdout=to_stdout,
-                                                         logfile = self.logfile,
-                                                         learn_os = True,
-                                                         init_config_commands = self.disable_config)
-                    log.debug('     Connected to device {}'.format(device))
+                    dev.connect(via = str(alias),
+                                connection_timeout=self.timeout,
+                                log_stdout=to_stdout,
+                                logfile = self.logfile,
+                                learn_os = True,
+                                init_config_commands = self.disable_config)
+                    log.debug('     Connected to device %s', device)
                 except Exception as e:
-                    log.debug('     Failed to connect to {} with alias {}'.format(device, self.alias_dict[device]))
-                    self.testbed.devices[device].destroy(str(self.alias_dict[device]))
+                    log.debug('     Failed to connect to %s with alias %s', device, alias)
+                    dev.destroy(str(alias))
                 else:
                     
                     # No exception raised - get out
-                    return self.testbed.devices[device].connected
+                    return dev.connected
             else:
-                log.debug('     Device {} does not have a connection with alias {}'.format(device, self.alias_dict[device]))
+                log.debug('     Device %s does not have a connection with alias %s', device, alias)
 
-        # Use default - Go through all connection on the device
-        for one_connect in self.testbed.devices[device].connections:
-            # if ssh_only is not enabled try to connect through all connections
-            if one_connect == 'defaults':
-                continue
-            if not self.ssh_only:
-                try:
-                    self.testbed.devices[device].connect(via = str(one_connect),
-                                                         connection_timeout=self.timeout,
-                                                         log_stdout=to_stdout,
-                                                         logfile = self.logfile,
-                                                         learn_os = True,
-                                                         init_config_commands = self.disable_config)
-                    log.debug('     Connected to device {}'.format(device))
-                    break
-                except Exception as e:
-                    log.debug('     Failed to connect to {name} using connection {conn}'.format(name = device, conn = one_connect))                   
-                    # if connection fails, erase the connection from connection mgr
-                    self.testbed.devices[device].destroy(str(one_connect))
-                continue
+        # Use default - Go through all connection on the device, only the
+        # ssh ones if ssh_only is enabled
+        connections = [one_connect for one_connect in dev.connections
+                       if one_connect != 'defaults' and (not self.ssh_only or
+                       dev.connections[one_connect].get('protocol', '') == 'ssh')]
+        if not connections:
+            log.debug('     Device %s has no connection to try', device)
 
-            # if ssh only is enabled, check if the connection protocol is ssh before trying to connect
-            if self.testbed.devices[device].connections[one_connect].get('protocol', '') == 'ssh':
-                try:
-                    self.testbed.devices[device].connect(via=str(one_connect),
-                                                         connection_timeout=self.timeout,
-                                                         log_stdout=to_stdout,
-                                                         logfile = self.logfile,
-                                                         learn_os = True,
-                                                         init_config_commands = self.disable_config)
-                    log.debug('     Connected to device {}'.format(device))
-                    break
-                except Exception as e:
-                    # if connection fails, erase the connection from connection mgr
-                    log.debug('     Failed to connect to {name} using connection {conn}'.format(name = device, conn = one_connect))
-                    self.testbed.devices[device].destroy(str(one_connect))
+        for one_connect in connections:
+            try:
+                dev.connect(via=str(one_connect),
+                            connection_timeout=self.timeout,
+                            log_stdout=to_stdout,
+                            logfile = self.logfile,
+                            learn_os = True,
+                            init_config_commands = self.disable_config)
+                log.debug('     Connected to device %s', device)
+                break
+            except Exception as e:
+                log.debug('     Failed to connect to %s using connection %s', device, one_connect)
+                # if connection fails, erase the connection from connection mgr
+                dev.destroy(str(one_connect))
         
-        if not self.testbed.devices[device]:
-            log.debug('     Failed to connect to {}'.format(device))
-        return self.testbed.devices[device].connected
+        if not dev.connected:
+            log.debug('     Failed to connect to %s', device)
+        return dev.connected
                 
 
+    def _devices_to_configure(self, configured):
+        '''Selects the connected devices with a supported os which have not
+        been visited yet, leaving out the ones already configured
+
+        Args:
+            configured ('set'): names of the devices to leave out
+
+        Returns:
+            list of devices to configure
+        '''
+        skip = self.visited_devices | configured
+        return [device_obj for device_name, device_obj in self.testbed.devices.items()
+                if device_name not in skip and device_obj.connected
+                and device_obj.os in self.supported_os]
+
+    def configure_testbed_neighbor_protocols(self):
+        '''Method checks which devices in the testbed need cdp and/or lldp
+        configuration and configures both protocols on the target devices
+        in a single parallel round
+        '''
+
+        # Check which device to configure cdp and lldp on
+        configured = self.cdp_configured & self.lldp_configured
+        device_to_configure = self._devices_to_configure(configured)
+
+        # No device to configure
+        if not device_to_configure:
+            return
+
+        # Configure cdp and lldp on these devices
+        res = pcall(self.configure_device_neighbor_protocols,
+                    device=device_to_configure)
+        for name, cdp, lldp in res:
+            if cdp:
+                self.cdp_configured.add(name)
+            if lldp:
+                self.lldp_configured.add(name)
+
+    def configure_device_neighbor_protocols(self, device):
+        '''Enables cdp and lldp on the device, skipping the protocols which
+        were already configured by the script
+
+        Args:
+            device ('device'): the device having cdp and lldp enabled
+
+        Returns:
+            the device name and whether cdp and lldp were configured
+        '''
+        cdp = lldp = False
+        if device.name not in self.cdp_configured:
+            cdp = self.configure_device_cdp_protocol(device)[1]
+        if device.name not in self.lldp_configured:
+            lldp = self.configure_device_lldp_protocol(device)[1]
+        return(device.name, cdp, lldp)
+
     def configure_testbed_cdp_protocol(self):
         ''' Method checks if cdp configuration is necessary for all devices in
         the testbed and if needed calls the cdp configuration method for the
@@ -159,11 +229,7 @@ class TestbedManager(object):
         '''
 
         # Check which device to configure CDP on
-        device_to_configure=[]
-        for device_name, device_obj in self.testbed.devices.items():
-            if device_name in self.visited_devices or device_name in self.cdp_configured or not device_obj.connected or device_obj.os not in self.supported_os:
-                continue
-            device_to_configure.append(device_obj)
+        device_to_configure = self._devices_to_configure(self.cdp_configured)
 
         # No device to configure
         if not device_to_configure:
@@ -185,22 +251,26 @@ class TestbedManager(object):
             device ('device'): the device having cdp enabled
         '''
 
+        api = device.api
+        name = device.name
+
         # Check if it is already enabled 
-        if device.api.verify_cdp_in_state(max_time=self.timeout, check_interval=5):
+        if api.verify_cdp_in_state(max_time=self.timeout, check_interval=5):
             # Already configured - Get out
-            return(device.name, False)
+            return(name, False)
         
-        log.debug('    Configuring cdp protocol for {}'.format(device.name))
+        log.debug('    Configuring cdp protocol for %s', name)
         # Configure it
         try:
-            device.api.configure_cdp()
-        except Exception:
-            log.error("     Exception configuring cdp "
-                      "for {device}".format(device=device.name),
-                                              exc_info=True)
-            return(device.name, False)
+            api.configure_cdp()
+        except Exception as e:
+            # the traceback is only formatted when debugging
+            log.error("     Exception configuring cdp for %s: %s", name, e)
+            log.debug("     Traceback configuring cdp for %s", name,
+                      exc_info=True)
+            return(name, False)
         else:
-            return(device.name, True)
+            return(name, True)
 
     def configure_testbed_lldp_protocol(self):
         ''' Method checks if lldp configuration is necessary for all devices in
@@ -209,11 +279,7 @@ class TestbedManager(object):
         '''
 
         # Check which device to configure lldp on
-        device_to_configure = []
-        for device_name, device_obj in self.testbed.devices.items():
-            if device_name in self.visited_devices or device_name in self.lldp_configured or not device_obj.connected or device_obj.os not in self.supported_os:
-                continue
-            device_to_configure.append(device_obj)
+        device_to_configure = self._devices_to_configure(self.lldp_configured)
 
         # No device to configure    
         if not device_to_configure:
@@ -235,22 +301,26 @@ class TestbedManager(object):
             device ('device'): the device having lldp enabled
         '''
 
+        api = device.api
+        name = device.name
+
         # Check if it is already enabled 
-        if device.api.verify_lldp_in_state(max_time= self.timeout, check_interval=5):
+        if api.verify_lldp_in_state(max_time= self.timeout, check_interval=5):
             # Already configured - Get out
-            return(device.name, False)
+            return(name, False)
         
-        log.debug('     Configuring lldp protocol for {}'.format(device.name))
+        log.debug('     Configuring lldp protocol for %s', name)
         # Configure it
         try:
-            device.api.configure_lldp()
-        except Exception:
-            log.error("     Exception configuring lldp "
-                      "for {device}".format(device=device.name),
+            api.configure_lldp()
+        except Exception as e:
+            # the traceback is only formatted when debugging
+            log.error("     Exception configuring lldp for %s: %s", name, e)
+            log.debug("     Traceback configuring lldp for %s", name,
                       exc_info=True)
-            return(device.name, False)
+            return(name, False)
         else:
-            return(device.name, True)
+            return(name, True)
 
     def get_neigbor_data(self):
         '''Takes a testbed and processes the cdp and lldp data of every
@@ -260,17 +330,16 @@ class TestbedManager(object):
             [{device:{'cdp':DATA, 'lldp':data}, device2:{'cdp':data,'lldp':data}}]
         '''
         dev_to_test = []
-        dev_to_test_names = set()
-        # if the device has not been visited add it to the list of devices to test
-        # and then add it to list of devices that have been visited
+        # if the device has not been visited add it to list of devices that
+        # have been visited, and to the list of devices to test only if it can
+        # be queried, so no pcall worker is spawned for nothing
         for device_name, device_obj in self.testbed.devices.items():
             if device_name in self.visited_devices:
                 continue
             self.visited_devices.add(device_name)
-            if device_obj.os in self.supported_os and device_obj.connected: 
-                dev_to_test.append(self.testbed.devices[device_name])
-                dev_to_test_names.add(device_name)
-            
+            if device_obj.connected and device_obj.os in self.supported_os:
+                dev_to_test.append(device_obj)
+
         # use pcall to get cdp and lldp information for all devices in to test list
         if dev_to_test:
             result = pcall(self.get_neighbor_info, device = dev_to_test)
@@ -290,27 +359,30 @@ class TestbedManager(object):
         if device.os not in self.supported_os or not device.connected:
             return {device.name: {'cdp':cdp, 'lldp':lldp}}
 
-        log.debug('     Getting cdp and lldp neighbor info for {}'.format(device.name))
+        api = device.api
+        name = device.name
+
+        log.debug('     Getting cdp and lldp neighbor info for %s', name)
         
         # get the devices cdp neighbor information
         try:
-            cdp = device.api.get_cdp_neighbors_info()
+            cdp = api.get_cdp_neighbors_info()
         except Exception as e:
-            log.error("     Exception occurred getting cdp info for {}".format(device.name))
+            log.error("     Exception occurred getting cdp info for %s", name)
             log.debug(e)
         if cdp is None:
-            log.debug("     No CDP information found on {}".format(device.name))
+            log.debug("     No CDP information found on %s", name)
 
         # get the devices lldp neighbor information
         try:
-            lldp = device.api.get_lldp_neighbors_info()
+            lldp = api.get_lldp_neighbors_info()
         except Exception as e:
-            log.error("     Exception occurred getting lldp info for {}".format(device.name))
+            log.error("     Exception occurred getting lldp info for %s", name)
             log.debug(e)
         if lldp is None:
-            log.debug("     No LLDP information found on {}".format(device.name))
-        log.debug('     Got cdp and lldp neighbor info for {}'.format(device.name))
-        return {device.name: {'cdp':cdp, 'lldp':lldp}}
+            log.debug("     No LLDP information found on %s", name)
+        log.debug('     Got cdp and lldp neighbor info for %s', name)
+        return {name: {'cdp':cdp, 'lldp':lldp}}
 
     def unconfigure_neighbor_discovery_protocols(self, device):
         '''Unconfigures neighbor discovery protocols on device if they
@@ -319,20 +391,22 @@ class TestbedManager(object):
         Args:
             device ('device'): device to unconfigure protocols on
         '''
-        log.debug('   Unconfiguring neighbor discovery protocol for {}'.format(device.name))
+        name = device.name
+
+        log.debug('   Unconfiguring neighbor discovery protocol for %s', name)
         # if the device had cdp configured by the script, disable cdp on the device
-        if device.name in self.cdp_configured:
+        if name in self.cdp_configured:
             try:
                 device.api.unconfigure_cdp()
             except Exception as e:
-                log.error('     Error unconfiguring cdp on device {}: {}'.format(device.name, e))
+                log.error('     Error unconfiguring cdp on device %s: %s', name, e)
 
         # if the device had lldp configured by the script, disable lldp on the device
-        if device.name in self.lldp_configured:
+        if name in self.lldp_configured:
             try:
                 device.api.unconfigure_lldp()
             except Exception as e:
-                log.error('     Error unconfiguring lldp on device {}: {}'.format(device.name, e))
+                log.error('     Error unconfiguring lldp on device %s: %s', name, e)
 
     def get_interfaces_ipV4_address(self, device):
         '''Get the ip address for all of the generated interfaces on the give device
@@ -341,19 +415,26 @@ class TestbedManager(object):
             device ('device'): device to get interface ip addresses for
         '''
         
-        log.debug('   Getting interface ipv4 addresses for {}'.format(device.name))
+        log.debug('   Getting interface ipv4 addresses for %s', device.name)
         # if the device isn't connected or the device doesn't have any interfaces to get ip address for
         if not device.connected or device.os not in self.supported_os or len(device.interfaces) < 1:
             return
-        for interface in device.interfaces.values():
-            if interface.ipv4 is None:
-                try:
-                    ip = device.api.get_interface_ipv4_address(interface.name )
-                except Exception:
-                    ip = None
-                if ip:
-                    ip = ipaddress.IPv4Interface(ip)
-                    interface.ipv4 = ip
+
+        # only the interfaces without an address need to be looked up, they
+        # are queried one by one as they share the device connection
+        targets = [interface for interface in device.interfaces.values()
+                   if interface.ipv4 is None]
+        if not targets:
+            return
+
+        get_ip = device.api.get_interface_ipv4_address
+        for interface in targets:
+            try:
+                ip = get_ip(interface.name)
+            except Exception:
+                ip = None
+            if ip:
+                interface.ipv4 = ipaddress.IPv4Interface(ip)
 
     def get_credentials_and_proxies(self, yaml):
         '''Takes a copy of the current credentials in the testbed for use in
@@ -367,21 +448,26 @@ class TestbedManager(object):
             list of proxies used by testbed devices
         '''
         credential_dict = {}
-        proxy_list = []
+        # signatures of the credentials collected so far
+        seen_credentials = set()
+        # proxies in order of first use, keyed by _proxy_key as proxies may
+        # also be given as dictionaries
+        proxies = OrderedDict()
         for device in yaml['devices'].values():
             
             # get all connections used in the testbed
-            if 'credentials' in device:
-                for cred in device['credentials']:
-                    if cred not in credential_dict :
-                        credential_dict[cred] = dict(device['credentials'][cred])
-                    elif device['credentials'][cred] not in credential_dict.values():
-                        credential_dict[cred + str(len(credential_dict))] = dict(device['credentials'][cred])
+            for cred, values in device.get('credentials', {}).items():
+                signature = tuple(sorted((k, str(v)) for k, v in values.items()))
+                if cred not in credential_dict:
+                    credential_dict[cred] = dict(values)
+                elif signature not in seen_credentials:
+                    credential_dict[cred + str(len(credential_dict))] = dict(values)
+                seen_credentials.add(signature)
 
             # get list of proxies used in connections
-            for connect in device['connections'].values():
+            for connect in device.get('connections', {}).values():
                 if 'proxy' in connect:
-                    if connect['proxy'] not in proxy_list:
-                        proxy_list.append(connect['proxy'])
+                    proxies.setdefault(_proxy_key(connect['proxy']), connect['proxy'])
 
+        proxy_list = list(proxies.values())
         return credential_dict, proxy_list
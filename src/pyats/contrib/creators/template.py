@@ -1,9 +1,5 @@
-import xlrd
-import xlwt
-import xlsxwriter
 import csv
 import os
-import logging
 
 from pyats.topology import Testbed
 from .creator import TestbedCreator
@@ -116,6 +112,8 @@ class Template(TestbedCreator):
         """ Helper for writing keys to XLS.
         
         """
+        import xlwt
+
         wb = xlwt.Workbook()
         ws = wb.add_sheet('testbed')
         for i, k in enumerate(self._keys):
@@ -126,7 +124,10 @@ class Template(TestbedCreator):
         """ Helper for writing keys to XLSX.
         
         """
-        wb = xlsxwriter.Workbook(output)
+        import xlsxwriter
+
+        # rows are flushed to disk as they are written
+        wb = xlsxwriter.Workbook(output, {'constant_memory': True})
         ws = wb.add_worksheet('testbed')
         ws.write_row('A1', self._keys)
         wb.close()
@@ -1,13 +1,17 @@
+import os
+import shutil
+import tempfile
 import unittest
 from unittest import TestCase, main
 from pyats.topology import Testbed
 from pyats.datastructures import Configuration
 from pyats.utils import secret_strings
 
+from pyats.contrib.creators.ansible import Ansible
+
 def check_ansible_installed():
     try:
-        global Ansible
-        from pyats.contrib.creators.ansible import Ansible
+        import ansible
     except ImportError:
         return True
     return False  
@@ -192,5 +196,53 @@ ansible_become_pass=Cisc0123
         with open(self.output) as file:
             self.assertEqual(file.read(), expected)
 
+    def test_inventory_cache(self):
+        creator = Ansible(inventory_name=self.inventory_file)
+        self.assertIs(creator._load_inventory(), creator._load_inventory())
+        testbed = creator._generate()
+        self.assertEqual('admin',
+                testbed['devices']['R1_xe']['credentials']['default']['username'])
+
+        # modified inventory must be exported again
+        with open(self.inventory_file, "w") as file:
+            file.write(self.inventory.replace('ansible_user=admin',
+                                              'ansible_user=operator'))
+        testbed = creator._generate()
+        self.assertEqual('operator',
+                testbed['devices']['R1_xe']['credentials']['default']['username'])
+
+    def test_inventory_stamp(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        inventory_file = os.path.join(tmpdir, 'inventory.ini')
+        with open(inventory_file, "w") as file:
+            file.write(self.inventory)
+
+        creator = Ansible(inventory_name=inventory_file)
+        stamp = creator._inventory_stamp(inventory_file)
+        self.assertEqual(stamp, creator._inventory_stamp(inventory_file))
+
+        # variables next to the inventory are part of the stamp
+        os.mkdir(os.path.join(tmpdir, 'group_vars'))
+        with open(os.path.join(tmpdir, 'group_vars', 'all.yml'), "w") as file:
+            file.write('ansible_user: operator\n')
+        self.assertNotEqual(stamp, creator._inventory_stamp(inventory_file))
+
+        # dynamic inventory scripts are never cached
+        os.chmod(inventory_file, 0o755)
+        self.assertIsNone(creator._inventory_stamp(inventory_file))
+
+        # neither are inventory plugin configs
+        plugin_file = os.path.join(tmpdir, 'inventory.yml')
+        with open(plugin_file, "w") as file:
+            file.write('plugin: constructed\nstrict: false\n')
+        self.assertIsNone(creator._inventory_stamp(plugin_file))
+
+        # while static YAML inventories are
+        yaml_file = os.path.join(tmpdir, 'hosts.yml')
+        with open(yaml_file, "w") as file:
+            file.write('all:\n  hosts:\n    R1_xe:\n')
+        self.assertIsNotNone(creator._inventory_stamp(yaml_file))
+
 if __name__ == '__main__':
     main()
@@ -2,10 +2,13 @@
 import os
 import sys
 
+from pyats.contrib.creators import creator
 from pyats.contrib.creators.creator import TestbedCreator
 from unittest import TestCase, main
+from unittest.mock import patch
 from pyats.topology import Testbed
 from pyats.topology.loader.base import BaseTestbedLoader
+from pyats.utils.secret_strings import SecretString
 
 class TestCreator(TestCase):
     def test_arguments(self):
@@ -136,6 +139,9 @@ class TestCreator(TestCase):
         self.assertEqual(test._items, [])
         self.assertEqual(test._a, '1')
         self.assertEqual(test._b, '1')
+        sys.argv = ["creator", "--a=1", "--b=1", "--items", "my-router", "-r"]
+        test = Test()
+        self.assertEqual(test._items, ['my-router'])
 
     def test_cli_replacements(self):
         class Test(TestbedCreator):
@@ -185,5 +191,18 @@ class TestCreator(TestCase):
                 return {}
         self.assertTrue(isinstance(Test().to_testbed_object(), Testbed))
 
+    def test_encode_secret_cached(self):
+        creator._encode_secret_cached.cache_clear()
+        with patch.object(SecretString, 'from_plaintext',
+                                wraps=SecretString.from_plaintext) as encode:
+            devices = {'a': {'password': 'pw'}, 'b': {'password': 'pw'},
+                       'c': {'password': '%ASK{}'}}
+            TestbedCreator()._encode_all_password(devices)
+            encode.assert_called_once_with('pw')
+        self.assertEqual(devices['a']['password'], devices['b']['password'])
+        self.assertTrue(devices['a']['password'].startswith('%ENC{'))
+        self.assertEqual(devices['c']['password'], '%ASK{}')
+        creator._encode_secret_cached.cache_clear()
+
 if __name__ == '__main__':
     main()        
@@ -1,6 +1,8 @@
 import os
 import shutil
+import tempfile
 import xlwt
+import xlsxwriter
 
 from pyats.contrib.creators.file import File
 from unittest import TestCase, main
@@ -194,6 +196,72 @@ class TestFile(TestCase):
         with open(self.output) as file:
             self.assertEqual(file.read(), self.expected_encoded)
 
+    def test_xlsx_load(self):
+        test_xlsx = '/tmp/test.xlsx'
+        wb = xlsxwriter.Workbook(test_xlsx)
+        ws = wb.add_worksheet('testbed')
+        ws.write_row('A1', [
+            'hostname', 'ip', 'username', 'password', 'protocol', 'os',
+            'custom:opt1', 'custom:opt2'
+        ])
+        ws.write_row('A2', [
+            'nx-osv-1', '172.25.192.90', 'admin', 'admin', 'telnet', 'nxos',
+            'ss1', 'ss2'
+        ])
+        wb.close()
+        File(path=test_xlsx, encode_password=True).to_testbed_file(
+            self.output)
+        with open(self.output) as file:
+            self.assertEqual(file.read(), self.expected_encoded)
+
+        # empty rows are reported like in CSV and XLS files
+        wb = xlsxwriter.Workbook(test_xlsx)
+        ws = wb.add_worksheet('testbed')
+        ws.write_row('A1', ['hostname', 'ip'])
+        ws.write_row('A3', ['nx-osv-1', '172.25.192.90'])
+        wb.close()
+        with self.assertRaisesRegex(KeyError, 'Empty line'):
+            File(path=test_xlsx).to_testbed_object()
+
+    def test_empty_csv_file(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        test_csv = os.path.join(tmpdir, 'empty.csv')
+        open(test_csv, "w").close()
+        with self.assertRaisesRegex(Exception, 'CSV file is empty'):
+            File(path=test_csv).to_testbed_object()
+
+    def test_device_data_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        test_csv = os.path.join(tmpdir, 'test.csv')
+        with open(test_csv, "w") as csv:
+            csv.write(self.csv_file)
+
+        creator = File(path=test_csv)
+        data = creator._read_device_data(test_csv)
+        self.assertIs(data, creator._read_device_data(test_csv))
+        self.assertEqual('admin', data[1][0]['username'])
+
+        # constructing the testbed must leave the cached rows untouched
+        creator._construct_yaml(data[1], keys=data[0])
+        self.assertEqual('admin', data[1][0]['username'])
+
+        # modified file must be parsed again
+        with open(test_csv, "w") as csv:
+            csv.write(self.csv_file.replace(',admin,admin,', ',operator,admin,'))
+        _, rows = creator._read_device_data(test_csv)
+        self.assertEqual('operator', rows[0]['username'])
+
+        # only the most recently used files are kept
+        for i in range(File._DEVICE_DATA_CACHE_SIZE):
+            other = os.path.join(tmpdir, 'other_{}.csv'.format(i))
+            with open(other, "w") as csv:
+                csv.write(self.csv_file)
+            creator._read_device_data(other)
+        self.assertLessEqual(len(File._device_data_cache),
+                             File._DEVICE_DATA_CACHE_SIZE)
+        self.assertNotIn(os.path.abspath(test_csv), File._device_data_cache)
 
 if __name__ == '__main__':
     main()
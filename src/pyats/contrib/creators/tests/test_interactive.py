@@ -192,5 +192,42 @@ class TestInteractive(TestCase):
         with open(output_file) as file:
             self.assertEqual(file.read(), expected)
 
+    @mock.patch('builtins.input')
+    @mock.patch('getpass.getpass')
+    def test_duplicate_hostname(self, getpass, input_function):
+        input_value = [
+            "n", "n", "n", "dev1", "123.123.123.123", "superuser",
+            "telnet", "linux", "y", "", "dev1", "dev2", "123.123.123.123",
+            "superuser", "telnet", "linux", "n"
+        ]
+        def mock_input(text):
+            return input_value.pop(0)
+        input_function.side_effect = mock_input
+        getpass.return_value = "super"
+        testbed = Interactive().to_testbed_object()
+        self.assertEqual(set(testbed.devices), {'dev1', 'dev2'})
+        self.assertEqual(input_value, [])
+
+    @mock.patch('builtins.input')
+    @mock.patch('getpass.getpass')
+    def test_custom_keys_two_devices(self, getpass, input_function):
+        input_value = [
+            "n", "n", "n", "dev1", "123.123.123.123", "superuser",
+            "telnet", "linux", "a1", "opt1", "y", "dev2", "123.123.123.123",
+            "superuser", "telnet", "linux", "a2", "opt2", "n"
+        ]
+        def mock_input(text):
+            return input_value.pop(0)
+        input_function.side_effect = mock_input
+        getpass.return_value = "super"
+        add_keys = ['a']
+        testbed = Interactive(add_keys=add_keys,
+                              add_custom_keys=['w']).to_testbed_object()
+        self.assertEqual(input_value, [])
+        self.assertEqual('opt1', testbed.devices['dev1'].custom.get('w'))
+        self.assertEqual('opt2', testbed.devices['dev2'].custom.get('w'))
+        self.assertEqual('a2', testbed.devices['dev2'].a)
+        self.assertEqual(add_keys, ['a'])
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,44 @@
+import unittest
+from unittest import TestCase, main
+
+try:
+    from pyats.contrib.creators.libs.testbed_manager import TestbedManager
+except ImportError:
+    TestbedManager = None
+
+@unittest.skipIf(TestbedManager is None, 'genie package is not installed')
+class TestTestbedManager(TestCase):
+
+    def test_get_credentials_and_proxies(self):
+        testbed = {
+            'devices': {
+                'R1': {
+                    'credentials': {'default': {'username': 'admin',
+                                                'password': 'admin'}},
+                    'connections': {
+                        'cli': {'proxy': {'device': 'jump',
+                                          'command': 'ssh 10.1.1.1'}}
+                    }
+                },
+                'R2': {
+                    'credentials': {'default': {'password': 'admin',
+                                                'username': 'admin'}},
+                    'connections': {
+                        'cli': {'proxy': {'command': 'ssh 10.1.1.1',
+                                          'device': 'jump'}},
+                        'a': {'proxy': 'jump'}
+                    }
+                }
+            }
+        }
+        manager = TestbedManager(testbed, supported_os=['iosxe'])
+        credentials, proxies = manager.get_credentials_and_proxies(testbed)
+
+        self.assertEqual({'default': {'username': 'admin',
+                                      'password': 'admin'}}, credentials)
+        # equal proxies are only listed once, whatever their key order
+        self.assertEqual([{'device': 'jump', 'command': 'ssh 10.1.1.1'},
+                          'jump'], proxies)
+
+if __name__ == '__main__':
+    main()
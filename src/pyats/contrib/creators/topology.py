@@ -228,8 +228,7 @@ class Topology(TestbedCreator):
                 log.info('   Configuring Testbed devices cdp and lldp protocol')
 
                 log.debug('--------DEBUG LOGS-------')
-                dev_man.configure_testbed_cdp_protocol()
-                dev_man.configure_testbed_lldp_protocol()
+                dev_man.configure_testbed_neighbor_protocols()
                 log.debug('--------CONSOLE LOGS--------')
                 time.sleep(5)
 